@@ -8,6 +8,8 @@ const InterviewChatbot = () => {
   const [interviewStarted, setInterviewStarted] = useState(false);
   const [selectedJob, setSelectedJob] = useState('');
   const messagesEndRef = useRef(null);
+  // Identifies this interview to the backend so it can avoid repeating questions
+  const sessionIdRef = useRef(null);
 
   const jobTypes = [
     'AI/Machine Learning',
@@ -28,9 +30,24 @@ const InterviewChatbot = () => {
     scrollToBottom();
   }, [messages]);
 
+  // Question messages are the assistant messages that carry a question type
+  const isQuestion = (msg) => msg.role === 'assistant' && Boolean(msg.type);
+
+  const getLastQuestion = (history) => {
+    for (let i = history.length - 1; i >= 0; i--) {
+      if (isQuestion(history[i])) return history[i].content;
+    }
+    return null;
+  };
+
+  // FastAPI sends a string detail for HTTPException but a list for validation errors
+  const errorDetail = (data) =>
+    typeof data?.detail === 'string' ? data.detail : 'Invalid request sent to backend.';
+
   const startInterview = async (job) => {
     setSelectedJob(job);
     setInterviewStarted(true);
+    sessionIdRef.current = crypto.randomUUID();
     
     const welcomeMsg = {
       role: 'assistant',
@@ -52,11 +69,14 @@ const InterviewChatbot = () => {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           job_type: job,
-          chat_history: history
+          chat_history: history,
+          question_index: history.filter(isQuestion).length,
+          session_id: sessionIdRef.current
         })
       });
 
       const data = await response.json();
+      if (!response.ok) throw new Error(errorDetail(data));
       
       setMessages(prev => [...prev, {
         role: 'assistant',
@@ -96,7 +116,8 @@ const InterviewChatbot = () => {
         body: JSON.stringify({
           job_type: selectedJob,
           answer: input,
-          chat_history: messages
+          chat_history: messages,
+          last_question: getLastQuestion(messages)
         })
       });
 
@@ -104,7 +125,7 @@ const InterviewChatbot = () => {
 
       setMessages(prev => [...prev, {
         role: 'assistant',
-        content: data.feedback,
+        content: response.ok ? data.feedback : `⚠️ ${errorDetail(data)}`,
         timestamp: new Date().toISOString()
       }]);
 
@@ -142,7 +163,8 @@ const InterviewChatbot = () => {
         body: JSON.stringify({
           job_type: selectedJob,
           answer: option,
-          chat_history: messages
+          chat_history: messages,
+          last_question: getLastQuestion(messages)
         })
       });
 
@@ -150,7 +172,7 @@ const InterviewChatbot = () => {
 
       setMessages(prev => [...prev, {
         role: 'assistant',
-        content: data.feedback,
+        content: response.ok ? data.feedback : `⚠️ ${errorDetail(data)}`,
         timestamp: new Date().toISOString()
       }]);
 
@@ -1,26 +1,120 @@
-from fastapi import FastAPI, HTTPException
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict
-import requests
+from types import MappingProxyType
+from typing import List, Mapping, Optional
+import asyncio
+import httpx
 import json
+import os
 import random
+import sys
+import time
 
-app = FastAPI(title="AI Interview Chatbot API")
+# orjson is optional; fall back to the stdlib json module when it isn't installed
+try:
+    import orjson
+    json_loads = orjson.loads
+    DefaultResponse = ORJSONResponse
+except ImportError:
+    json_loads = json.loads
+    DefaultResponse = JSONResponse
 
-# Enable CORS for frontend
+
+class OllamaError(Exception):
+    """Raised when Ollama can't be reached or fails to generate a response"""
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create a shared HTTP client for Ollama calls and close it on shutdown"""
+    app.state.http_client = httpx.AsyncClient(
+        timeout=30,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32)
+    )
+    
+    # Warm the connection pool and load the model before the first evaluation
+    try:
+        await app.state.http_client.post(
+            OLLAMA_API,
+            json={"model": MODEL_NAME, "prompt": "ping", "stream": False, "options": {"num_predict": 1}},
+            timeout=60
+        )
+    except Exception:
+        pass
+    
+    yield
+    await app.state.http_client.aclose()
+
+
+app = FastAPI(
+    title="AI Interview Chatbot API",
+    lifespan=lifespan,
+    default_response_class=DefaultResponse
+)
+
+# Enable CORS for frontend (comma-separated origins in CORS_ORIGINS)
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=[
+        origin.strip()
+        for origin in os.environ.get("CORS_ORIGINS", "http://localhost:3000").split(",")
+        if origin.strip()
+    ],
+    allow_credentials=False,
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type"],
 )
 
 # Ollama API endpoint (default local)
 OLLAMA_API = "http://localhost:11434/api/generate"
+OLLAMA_TAGS_API = "http://localhost:11434/api/tags"
 MODEL_NAME = "deepseek-r1:1.5b"  # Change to your installed model
 
+# Uvicorn worker processes. Caches, session decks and the Ollama limit below are
+# per process, so only raise this via WEB_CONCURRENCY when that split is acceptable
+WORKERS = int(os.environ.get("WEB_CONCURRENCY", "1"))
+
+# Cache /health results briefly so frequent probes don't hit Ollama each time
+HEALTH_CACHE_TTL = 5
+_health_cache = {"ts": 0.0, "val": None}
+
+# How many recent messages to search when looking for the last question
+HISTORY_SCAN_LIMIT = 20
+
+# Max concurrent Ollama generations; match the server's OLLAMA_NUM_PARALLEL.
+# The semaphore is per process, so the budget is split across workers
+OLLAMA_NUM_PARALLEL = int(os.environ.get("OLLAMA_NUM_PARALLEL", "4"))
+OLLAMA_SEMAPHORE = asyncio.Semaphore(max(1, OLLAMA_NUM_PARALLEL // WORKERS))
+
+# Evaluation prompt template, filled in per request
+EVAL_PROMPT = """You are an expert technical interviewer for {job_type} positions.
+
+Question asked: {question}
+
+Candidate's answer: {answer}
+
+Provide a brief evaluation (2-3 sentences):
+1. Is the answer correct/appropriate?
+2. Give constructive feedback
+3. Mention if anything is missing
+
+Keep it professional and encouraging. Format: "✓ [Your evaluation]" or "✗ [Your feedback]"
+"""
+
+# Bounded LRU cache of evaluations keyed by (job_type, question, answer)
+EVAL_CACHE_SIZE = 1024
+_eval_cache = OrderedDict()
+
+# Shuffled question decks per (session_id, job_type), bounded like the eval cache.
+# Decks live in this process, so with several workers a session only keeps its
+# no-repeat order while its requests land on the same worker
+SESSION_DECK_CACHE_SIZE = 1024
+_session_decks = OrderedDict()
+
 # Question banks by job type and difficulty
 QUESTION_BANK = {
     "AI/Machine Learning": {
@@ -159,83 +253,196 @@ for job in ["Frontend Developer", "Backend Developer", "DevOps Engineer", "JavaS
         }
 
 
+def _freeze(value, seen: dict):
+    """Recursively convert the bank to interned strings, tuples and read-only mappings"""
+    if isinstance(value, str):
+        return sys.intern(value)
+    # Job types share the same category lists, so freeze each object only once
+    if id(value) in seen:
+        return seen[id(value)]
+    if isinstance(value, dict):
+        frozen = MappingProxyType({_freeze(k, seen): _freeze(v, seen) for k, v in value.items()})
+    elif isinstance(value, (list, tuple)):
+        frozen = tuple(_freeze(v, seen) for v in value)
+    else:
+        return value
+    seen[id(value)] = frozen
+    return frozen
+
+
+# Freeze the bank so it stays read-only (and shared across forked workers) once loaded
+QUESTION_BANK = _freeze(QUESTION_BANK, {})
+
+
 class Message(BaseModel):
+    # The frontend also sends display fields (type, options); ignore them
+    model_config = {"extra": "ignore"}
+    
     role: str
-    content: str
+    content: str = ""
     timestamp: Optional[str] = None
 
 
 class QuestionRequest(BaseModel):
     job_type: str
-    chat_history: List[Dict]
+    chat_history: List[Message]
+    question_index: Optional[int] = None
+    session_id: Optional[str] = None
 
 
 class EvaluateRequest(BaseModel):
     job_type: str
     answer: str
-    chat_history: List[Dict]
+    chat_history: List[Message]
+    last_question: Optional[str] = None
 
 
-def call_ollama(prompt: str, model: str = MODEL_NAME) -> str:
+async def call_ollama(client: httpx.AsyncClient, prompt: str, model: str = MODEL_NAME) -> str:
     """Call Ollama API to generate response"""
     try:
         payload = {
             "model": model,
             "prompt": prompt,
-            "stream": False,
+            "stream": True,
             "options": {
                 "temperature": 0.7,
                 "top_p": 0.9
             }
         }
         
-        response = requests.post(OLLAMA_API, json=payload, timeout=30)
-        response.raise_for_status()
+        # Stream the generation and accumulate chunks into a single string
+        parts = []
+        timeout = httpx.Timeout(120, connect=5)
+        async with client.stream("POST", OLLAMA_API, json=payload, timeout=timeout) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json_loads(line)
+                if "error" in chunk:
+                    raise OllamaError(chunk["error"])
+                parts.append(chunk.get("response", ""))
+                if chunk.get("done"):
+                    break
+            else:
+                # Partial text from a truncated stream isn't a usable evaluation
+                raise OllamaError("Ollama stream ended before the response was done")
         
-        result = response.json()
-        return result.get("response", "").strip()
+        return "".join(parts).strip()
     
-    except requests.exceptions.ConnectionError:
-        return "ERROR: Cannot connect to Ollama. Make sure Ollama is running (ollama serve)"
-    except requests.exceptions.Timeout:
-        return "ERROR: Ollama request timed out"
+    except OllamaError:
+        raise
+    except httpx.ConnectError as e:
+        raise OllamaError("Cannot connect to Ollama. Make sure Ollama is running (ollama serve)") from e
+    except httpx.TimeoutException as e:
+        raise OllamaError("Ollama request timed out") from e
     except Exception as e:
-        return f"ERROR: {str(e)}"
+        # Some httpx errors (e.g. ReadError) have an empty message
+        raise OllamaError(str(e) or type(e).__name__) from e
+
+
+def _build_prompt(job_type: str, question: str, answer: str) -> str:
+    """Create evaluation prompt for Ollama"""
+    return EVAL_PROMPT.format_map({"job_type": job_type, "question": question, "answer": answer})
+
+
+async def _cached_eval(client: httpx.AsyncClient, job_type: str, question: str, answer: str) -> str:
+    """Evaluate an answer, reusing earlier feedback for identical submissions"""
+    key = (job_type, question, answer)
+    if key in _eval_cache:
+        _eval_cache.move_to_end(key)
+        return _eval_cache[key]
+    
+    # OllamaError propagates before caching, so the next attempt retries Ollama
+    async with OLLAMA_SEMAPHORE:
+        feedback = await call_ollama(client, _build_prompt(job_type, question, answer))
+    
+    _eval_cache[key] = feedback
+    if len(_eval_cache) > EVAL_CACHE_SIZE:
+        _eval_cache.popitem(last=False)
+    
+    return feedback
+
+
+def _get_session_deck(session_id: str, job_type: str, bank: Mapping) -> dict:
+    """Shuffle each question category once per session so questions don't repeat"""
+    key = (session_id, job_type)
+    deck = _session_decks.get(key)
+    if deck is None:
+        deck = {
+            q_type: {"questions": random.sample(bank[q_type], len(bank[q_type])), "cursor": 0}
+            for q_type in ("mcq", "short", "coding")
+        }
+        _session_decks[key] = deck
+        if len(_session_decks) > SESSION_DECK_CACHE_SIZE:
+            _session_decks.popitem(last=False)
+    else:
+        _session_decks.move_to_end(key)
+    return deck
+
+
+def _build_mcq(question_data: Mapping) -> dict:
+    return {
+        "type": "mcq",
+        "question": question_data["question"],
+        "options": question_data["options"],
+        "answer": question_data["answer"]
+    }
 
 
-def get_random_question(job_type: str, question_count: int):
+def _build_short(question: str) -> dict:
+    return {
+        "type": "short",
+        "question": question,
+        "options": None
+    }
+
+
+def _build_coding(question: str) -> dict:
+    return {
+        "type": "coding",
+        "question": question,
+        "options": None
+    }
+
+
+# Question type rotation, indexed by question_count
+_QUESTION_BUILDERS = (
+    ("mcq", _build_mcq),
+    ("short", _build_short),
+    ("coding", _build_coding),
+)
+
+
+def get_random_question(job_type: str, question_count: int, session_id: Optional[str] = None):
     """Select a random question from the bank"""
     if job_type not in QUESTION_BANK:
         job_type = "Full Stack Developer"
     
     bank = QUESTION_BANK[job_type]
+    deck = _get_session_deck(session_id, job_type, bank) if session_id else None
+    
+    def pick(q_type):
+        # Without a session there is no deck to walk, so fall back to random.choice
+        if deck is None:
+            return random.choice(bank[q_type])
+        entry = deck[q_type]
+        # Reshuffle once every question in the category has been asked,
+        # without letting the last question come straight back
+        if entry["cursor"] == len(entry["questions"]):
+            last = entry["questions"][-1]
+            questions = random.sample(bank[q_type], len(bank[q_type]))
+            if len(questions) > 1 and questions[0] is last:
+                questions[0], questions[-1] = questions[-1], questions[0]
+            entry["questions"] = questions
+            entry["cursor"] = 0
+        question = entry["questions"][entry["cursor"]]
+        entry["cursor"] += 1
+        return question
     
     # Rotate through question types
-    if question_count % 3 == 0:
-        q_type = "mcq"
-        question_data = random.choice(bank["mcq"])
-        return {
-            "type": "mcq",
-            "question": question_data["question"],
-            "options": question_data["options"],
-            "answer": question_data["answer"]
-        }
-    elif question_count % 3 == 1:
-        q_type = "short"
-        question = random.choice(bank["short"])
-        return {
-            "type": "short",
-            "question": question,
-            "options": None
-        }
-    else:
-        q_type = "coding"
-        question = random.choice(bank["coding"])
-        return {
-            "type": "coding",
-            "question": question,
-            "options": None
-        }
+    q_type, build = _QUESTION_BUILDERS[question_count % len(_QUESTION_BUILDERS)]
+    return build(pick(q_type))
 
 
 @app.get("/")
@@ -248,13 +455,16 @@ def read_root():
 
 
 @app.post("/api/question")
-def generate_question(request: QuestionRequest):
+async def generate_question(request: QuestionRequest):
     """Generate next interview question"""
     try:
-        question_count = len([m for m in request.chat_history if m.get("role") == "assistant"])
+        if request.question_index is not None:
+            question_count = request.question_index
+        else:
+            question_count = sum(1 for m in request.chat_history if m.role == "assistant")
         
         # Get question from bank
-        q_data = get_random_question(request.job_type, question_count)
+        q_data = get_random_question(request.job_type, question_count, request.session_id)
         
         return {
             "question": q_data["question"],
@@ -267,66 +477,67 @@ def generate_question(request: QuestionRequest):
 
 
 @app.post("/api/evaluate")
-def evaluate_answer(request: EvaluateRequest):
+async def evaluate_answer(request: EvaluateRequest, req: Request):
     """Evaluate user's answer using Ollama"""
     try:
-        # Get last question from history
-        last_question = None
-        for msg in reversed(request.chat_history):
-            if msg.get("role") == "assistant" and "?" in msg.get("content", ""):
-                last_question = msg.get("content")
-                break
+        # Use the question sent by the client, otherwise find it in history
+        last_question = request.last_question
+        if not last_question:
+            # The question is near the tail, so only walk back the last few messages
+            history = request.chat_history
+            for i in range(len(history) - 1, max(-1, len(history) - 1 - HISTORY_SCAN_LIMIT), -1):
+                msg = history[i]
+                if msg.role == "assistant" and "?" in msg.content:
+                    last_question = msg.content
+                    break
         
         if not last_question:
             return {"feedback": "Question not found in history."}
         
-        # Create evaluation prompt for Ollama
-        prompt = f"""You are an expert technical interviewer for {request.job_type} positions.
-
-Question asked: {last_question}
-
-Candidate's answer: {request.answer}
-
-Provide a brief evaluation (2-3 sentences):
-1. Is the answer correct/appropriate?
-2. Give constructive feedback
-3. Mention if anything is missing
-
-Keep it professional and encouraging. Format: "✓ [Your evaluation]" or "✗ [Your feedback]"
-"""
-        
-        # Call Ollama for evaluation
-        feedback = call_ollama(prompt)
-        
-        if feedback.startswith("ERROR:"):
-            return {"feedback": f"⚠️ {feedback}"}
+        # Call Ollama for evaluation (cached for repeated answers)
+        feedback = await _cached_eval(
+            req.app.state.http_client, request.job_type, last_question, request.answer
+        )
         
         return {"feedback": feedback}
     
+    except OllamaError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/health")
-def health_check():
+async def health_check(req: Request):
     """Check if Ollama is running"""
+    now = time.monotonic()
+    if _health_cache["val"] is not None and now - _health_cache["ts"] < HEALTH_CACHE_TTL:
+        return _health_cache["val"]
+    
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
-        models = response.json().get("models", [])
-        return {
+        response = await req.app.state.http_client.get(OLLAMA_TAGS_API, timeout=5)
+        models = json_loads(response.content).get("models", [])
+        result = {
             "ollama_status": "running",
             "available_models": [m["name"] for m in models]
         }
     except:
-        return {
+        result = {
             "ollama_status": "not_running",
             "message": "Start Ollama with: ollama serve"
         }
+    
+    _health_cache["ts"] = now
+    _health_cache["val"] = result
+    return result
 
 
 if __name__ == "__main__":
     import uvicorn
     print("🚀 Starting AI Interview Chatbot API...")
-    print("📝 Make sure Ollama is running: ollama serve")
+    print(f"📝 Make sure Ollama is running: OLLAMA_NUM_PARALLEL={OLLAMA_NUM_PARALLEL} ollama serve")
     print(f"🤖 Using model: {MODEL_NAME}")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    print(f"⚙️  Workers: {WORKERS}")
+    # App is passed as an import string so each worker process can load it.
+    # "auto" picks uvloop/httptools when installed (pip install "uvicorn[standard]")
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WORKERS, loop="auto", http="auto")